@@ -3,19 +3,373 @@ Advanced Music Mixer
 프로페셔널 DJ 스타일의 고급 음악 믹싱 엔진
 """
 
+import os
+import multiprocessing
+import tempfile
+from functools import lru_cache
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
 import numpy as np
 import librosa
 import soundfile as sf
+import soxr
 from pydub import AudioSegment
 import pyrubberband as pyrb
 from pedalboard import Pedalboard, HighpassFilter, LowpassFilter, Gain
+from numba import njit, prange
 from typing import Dict, Tuple, Optional
 from audio_analyzer import AudioAnalyzer
 
 
+# bass_swap 전환에서 저음/고음을 나누는 크로스오버 주파수 (Hz)
+BASS_CROSSOVER_HZ = 200.0
+
+
+# Numba 커널은 모듈 레벨에 두고 시그니처를 명시해서 import 시점에 컴파일,
+# cache=True로 컴파일 결과를 __pycache__에 저장해 다음 실행부터 JIT 비용 제거
+@njit('void(float32[:, :], float32[:, :], float32[:, :], float32[:], float32[:], int64, int64, int64)',
+      parallel=True, fastmath=True, cache=True)
+def _fused_crossfade(mixed, audio1, audio2, fade_out, fade_in, fade_start, mixin_sample, n):
+    """
+    페이드 아웃 곱셈과 페이드 인 덧셈을 한 번의 패스로 처리하는 크로스페이드 커널
+    
+    mixed[fade_start:fade_start + len(fade_out)]에 audio1 * fade_out + audio2 * fade_in을 직접 기록
+    (audio2는 mixin_sample부터 n 샘플만 사용, 그 이후는 audio1 페이드 아웃만 적용)
+    """
+    for i in prange(fade_out.shape[0]):
+        for ch in range(mixed.shape[1]):
+            value = audio1[fade_start + i, ch] * fade_out[i]
+            if i < n:
+                value += audio2[mixin_sample + i, ch] * fade_in[i]
+            mixed[fade_start + i, ch] = value
+
+
+@lru_cache(maxsize=32)
+def _equal_power_curves(n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Equal-power 페이드 커브 생성 (선형 페이드의 중간 지점 -3 dB 음량 저하 방지)
+    
+    전환 길이는 대부분 같은 값이 반복되므로 길이별로 캐시해서 재사용
+    (반환 배열은 캐시와 공유되므로 호출 측에서 수정하면 안 됨)
+    
+    Returns:
+        (fade_out, fade_in) - float32, 길이 n
+    """
+    step = (np.pi / 2) / (n - 1) if n > 1 else 0.0
+    t = np.arange(n, dtype=np.float32) * np.float32(step)
+    return np.cos(t), np.sin(t)
+
+
+@lru_cache(maxsize=32)
+def _linear_curves(n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    선형 페이드 커브 생성 (길이별로 캐시, 반환 배열은 캐시와 공유되므로 수정하면 안 됨)
+    
+    Returns:
+        (fade_out, fade_in) - float32, 길이 n
+    """
+    step = 1.0 / (n - 1) if n > 1 else 0.0
+    fade_in = np.arange(n, dtype=np.float32) * np.float32(step)
+    return np.float32(1.0) - fade_in, fade_in
+
+
+@njit('void(float32[:, :], float32[:, :], float32[:, :], float64, float64, float64)',
+      fastmath=True, cache=True)
+def _crossover(x, lp_out, hp_out, a1, b0, b1):
+    """
+    One-pole 크로스오버 커널: 신호를 저음(lp_out)과 고음(hp_out)으로 분리
+    
+    lp_out: y[n] = b0*x[n] + b1*x[n-1] - a1*y[n-1]
+    hp_out: x - lp_out
+    (재귀 필터라 NumPy로는 벡터화가 안 되므로 Numba로 샘플 루프를 컴파일)
+    """
+    for ch in range(x.shape[1]):
+        x_prev = 0.0
+        y_prev = 0.0
+        for n in range(x.shape[0]):
+            y = b0 * x[n, ch] + b1 * x_prev - a1 * y_prev
+            lp_out[n, ch] = y
+            hp_out[n, ch] = x[n, ch] - y
+            x_prev = x[n, ch]
+            y_prev = y
+
+
+@njit('float64(float32[:, :], float64[:, :], float64[:, :], int64, float64[:], float64[:])',
+      fastmath=True, cache=True)
+def _k_weighted_energy(audio, coeffs, state, hop, carry, energies):
+    """
+    K-weighting 필터(ITU-R BS.1770 pre-filter + RLB high-pass)를 통과시킨 신호의
+    hop 샘플 단위 에너지(채널 합산 제곱합)를 energies에 기록
+    
+    필터 상태(state)와 hop에 못 미친 나머지(carry = [에너지, 샘플 수])를 유지하므로
+    블록 단위로 이어서 호출 가능
+    
+    Returns:
+        입력의 절대값 최대치 (sample peak)
+    """
+    b00, b01, b02, a01, a02 = coeffs[0, 0], coeffs[0, 1], coeffs[0, 2], coeffs[0, 3], coeffs[0, 4]
+    b10, b11, b12, a11, a12 = coeffs[1, 0], coeffs[1, 1], coeffs[1, 2], coeffs[1, 3], coeffs[1, 4]
+    
+    peak = 0.0
+    acc = carry[0]
+    count = int(carry[1])
+    k = 0
+    for n in range(audio.shape[0]):
+        energy = 0.0
+        for ch in range(audio.shape[1]):
+            x = audio[n, ch]
+            peak = max(peak, abs(x))
+            
+            # 두 개의 biquad를 직렬로 적용 (transposed direct form II)
+            y = b00 * x + state[ch, 0]
+            state[ch, 0] = b01 * x - a01 * y + state[ch, 1]
+            state[ch, 1] = b02 * x - a02 * y
+            
+            z = b10 * y + state[ch, 2]
+            state[ch, 2] = b11 * y - a11 * z + state[ch, 3]
+            state[ch, 3] = b12 * y - a12 * z
+            
+            energy += z * z
+        
+        acc += energy
+        count += 1
+        if count == hop:
+            energies[k] = acc
+            k += 1
+            acc = 0.0
+            count = 0
+    
+    carry[0] = acc
+    carry[1] = count
+    return peak
+
+
+def _k_weighting_coeffs(sample_rate: int) -> np.ndarray:
+    """
+    샘플레이트에 맞는 BS.1770 K-weighting biquad 계수 (libebur128과 동일한 설계식)
+    
+    Returns:
+        (2, 5) 배열 - 각 행이 [b0, b1, b2, a1, a2]
+    """
+    # Stage 1: high-shelf pre-filter (머리에 의한 음향 효과 보정)
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    
+    # Stage 2: RLB high-pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    
+    return np.array([shelf, highpass], dtype=np.float64)
+
+
+class _LoudnessMeter:
+    """
+    ITU-R BS.1770 integrated loudness (LUFS) 측정기
+    
+    feed()로 오디오를 순서대로 나눠 넣을 수 있어 전체 믹스를 메모리에 올리지 않고도 측정 가능
+    """
+    
+    BLOCK_SECONDS = 0.4      # 게이팅 블록 길이
+    HOP_SECONDS = 0.1        # 블록 간격 (75% overlap)
+    ABSOLUTE_GATE = -70.0    # LUFS
+    RELATIVE_GATE = -10.0    # LU
+    
+    def __init__(self, sample_rate: int, channels: int = 2):
+        self.coeffs = _k_weighting_coeffs(sample_rate)
+        self.state = np.zeros((channels, 4), dtype=np.float64)
+        self.hop = int(round(sample_rate * self.HOP_SECONDS))
+        self.carry = np.zeros(2, dtype=np.float64)
+        self.hop_energies = []
+        self.peak = 0.0
+    
+    def feed(self, audio: np.ndarray):
+        """오디오 블록 (samples, channels) float32 추가"""
+        n_hops = (int(self.carry[1]) + audio.shape[0]) // self.hop
+        energies = np.empty(n_hops, dtype=np.float64)
+        peak = _k_weighted_energy(audio, self.coeffs, self.state, self.hop, self.carry, energies)
+        self.peak = max(self.peak, peak)
+        self.hop_energies.append(energies)
+    
+    def integrated_loudness(self) -> float:
+        """
+        게이팅된 integrated loudness (LUFS), 무음이면 -inf
+        """
+        hop_energies = np.concatenate(self.hop_energies) if self.hop_energies else np.zeros(0)
+        hops_per_block = int(round(self.BLOCK_SECONDS / self.HOP_SECONDS))
+        
+        if len(hop_energies) >= hops_per_block:
+            # 400ms 블록의 평균 제곱 (hop 4개씩 슬라이딩)
+            block_energy = np.convolve(hop_energies, np.ones(hops_per_block), mode='valid')
+            block_power = block_energy / (hops_per_block * self.hop)
+        else:
+            # 블록 하나보다 짧은 오디오는 전체를 하나의 블록으로 취급
+            n_samples = len(hop_energies) * self.hop + self.carry[1]
+            if n_samples == 0:
+                return float('-inf')
+            block_power = np.array([(hop_energies.sum() + self.carry[0]) / n_samples])
+        
+        with np.errstate(divide='ignore'):
+            block_loudness = -0.691 + 10 * np.log10(block_power)
+        
+        gated = block_loudness > self.ABSOLUTE_GATE
+        if not np.any(gated):
+            return float('-inf')
+        
+        relative_threshold = -0.691 + 10 * np.log10(np.mean(block_power[gated])) + self.RELATIVE_GATE
+        gated &= block_loudness > relative_threshold
+        
+        return float(-0.691 + 10 * np.log10(np.mean(block_power[gated])))
+
+
+def _nearest_beat(beats: np.ndarray, t: float) -> float:
+    """
+    정렬된 비트 타임스탬프에서 t에 가장 가까운 비트를 이진 탐색으로 찾기
+    
+    Args:
+        beats: 오름차순 비트 타임스탬프 (비어 있으면 안 됨)
+        t: 기준 시간 (초)
+    """
+    idx = int(np.searchsorted(beats, t))
+    if idx == 0:
+        return beats[0]
+    if idx == len(beats):
+        return beats[-1]
+    # 거리가 같으면 앞쪽 비트 (np.argmin과 동일한 선택)
+    return beats[idx - 1] if t - beats[idx - 1] <= beats[idx] - t else beats[idx]
+
+
+def _copy_tail(mixed: np.ndarray, audio2: np.ndarray,
+               remaining_start: int, remaining_audio2_start: int, total_length: int) -> int:
+    """
+    크로스페이드 이후 Track2의 나머지 부분을 mixed에 그대로 복사
+    
+    Returns:
+        복사된 샘플 수
+    """
+    remaining_length = min(
+        audio2.shape[0] - remaining_audio2_start,
+        total_length - remaining_start
+    )
+    if remaining_length <= 0:
+        return 0
+    
+    np.copyto(mixed[remaining_start:remaining_start + remaining_length],
+              audio2[remaining_audio2_start:remaining_audio2_start + remaining_length],
+              casting='no')
+    return remaining_length
+
+
+def _one_pole_lowpass_coeffs(cutoff_hz: float, sample_rate: int) -> Tuple[float, float, float]:
+    """
+    Bilinear transform으로 one-pole 저역 통과 필터 계수 계산
+    
+    Returns:
+        (b0, b1, a1)
+    """
+    k = np.tan(np.pi * cutoff_hz / sample_rate)
+    b0 = k / (1 + k)
+    return b0, b0, (k - 1) / (k + 1)
+
+
+def _classic_crossfade(mixed, audio1, audio2, fade_out, fade_in,
+                       fade_start, track2_fade_start, track2_fade_samples, sample_rate):
+    """Classic crossfade: Track1 페이드 아웃 + Track2 페이드 인 (한 번의 패스)"""
+    _fused_crossfade(mixed, audio1, audio2, fade_out, fade_in,
+                     fade_start, track2_fade_start, track2_fade_samples)
+
+
+def _bass_swap_crossfade(mixed, audio1, audio2, fade_out, fade_in,
+                         fade_start, track2_fade_start, track2_fade_samples, sample_rate):
+    """Bass swap: 저음은 먼저 빠르게 교체하고 나머지 주파수는 천천히 블렌딩"""
+    print("    🔊 Applying bass swap...")
+    
+    fade_samples = fade_out.shape[0]
+    fade_end = fade_start + fade_samples
+    
+    # 저음/고음 분리: 페이드 구간만 크로스오버 필터로 나눔
+    segment1 = np.ascontiguousarray(audio1[fade_start:fade_end], dtype=np.float32)
+    segment2 = np.zeros_like(segment1)
+    segment2[:track2_fade_samples] = audio2[track2_fade_start:track2_fade_start + track2_fade_samples]
+    
+    b0, b1, a1 = _one_pole_lowpass_coeffs(BASS_CROSSOVER_HZ, sample_rate)
+    low1, high1 = np.empty_like(segment1), np.empty_like(segment1)
+    low2, high2 = np.empty_like(segment2), np.empty_like(segment2)
+    _crossover(segment1, low1, high1, a1, b0, b1)
+    _crossover(segment2, low2, high2, a1, b0, b1)
+    
+    # 저음은 앞쪽 절반 동안 빠르게 교체, 나머지 주파수는 전체 구간에 걸쳐 블렌딩
+    bass_fade_samples = fade_samples // 2
+    bass_fade_out = np.zeros(fade_samples, dtype=np.float32)
+    bass_fade_in = np.ones(fade_samples, dtype=np.float32)
+    bass_fade_out[:bass_fade_samples], bass_fade_in[:bass_fade_samples] = \
+        _equal_power_curves(bass_fade_samples)
+    
+    # 네 대역을 결과 구간에 바로 누적 (다 쓴 low1을 임시 버퍼로 재사용해 중간 배열 할당 없음)
+    out = mixed[fade_start:fade_end]
+    scratch = low1
+    np.multiply(low1, bass_fade_out[:, np.newaxis], out=out)
+    np.multiply(high1, fade_out[:, np.newaxis], out=scratch)
+    np.add(out, scratch, out=out)
+    np.multiply(low2, bass_fade_in[:, np.newaxis], out=scratch)
+    np.add(out, scratch, out=out)
+    np.multiply(high2, fade_in[:, np.newaxis], out=scratch)
+    np.add(out, scratch, out=out)
+
+
+# 전환 스타일 → 페이드 구간 처리 함수
+_CROSSFADE_IMPL = {
+    'classic': _classic_crossfade,
+    'bass_swap': _bass_swap_crossfade,
+    'filter_sweep': _classic_crossfade,  # 개발 중 - classic 사용
+}
+
+
+class _DeferredFuture(Future):
+    """result()를 처음 호출할 때 현재 프로세스에서 작업을 실행하는 Future"""
+    
+    def __init__(self, fn, args, kwargs):
+        super().__init__()
+        self._call = (fn, args, kwargs)
+    
+    def result(self, timeout=None):
+        if self._call is not None:
+            fn, args, kwargs = self._call
+            self._call = None
+            try:
+                self.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                self.set_exception(e)
+        return super().result(timeout)
+
+
+class _InlineExecutor(Executor):
+    """
+    현재 프로세스에서 실행하는 Executor (결과가 필요해질 때까지 실행을 미룸)
+    
+    이미 워커 프로세스 안에서 믹싱할 때 (backend 프로세스 풀) 풀 안에 풀을 또 만들지 않고
+    워밍업된 프로세스에서 그대로 분석하기 위해 사용
+    병렬로 겹칠 수 없으므로 submit 시점에 미리 디코딩하지 않아 메모리에는 믹싱 중인 두 트랙만 유지
+    """
+    
+    def submit(self, fn, *args, **kwargs):
+        return _DeferredFuture(fn, args, kwargs)
+
+
 class AdvancedMixer:
     """전문가급 음악 믹싱 엔진"""
     
+    # mix_playlist에서 동시에 미리 로드/분석하는 최대 트랙 수 (디코딩된 트랙이 메모리에 머무는 수)
+    PREFETCH_TRACKS = 4
+    
+    # 이 값보다 BPM 차이가 작으면 템포 매칭을 하지 않음
+    TEMPO_TOLERANCE_BPM = 0.5
+    
     def __init__(self):
         self.sample_rate = 44100
     
@@ -27,15 +381,28 @@ class AdvancedMixer:
             file_path: 오디오 파일 경로
             
         Returns:
-            (audio_data, sample_rate)
+            (audio_data, sample_rate) - audio_data는 인터리브드 (samples, channels) 레이아웃
         """
-        y, sr = librosa.load(file_path, sr=self.sample_rate, mono=False)
+        try:
+            # soundfile로 바로 float32 (samples, channels) 디코딩
+            # 이미 목표 샘플레이트면 리샘플링 없이 그대로 사용
+            y, sr = sf.read(file_path, dtype='float32', always_2d=True)
+            if sr != self.sample_rate:
+                y = soxr.resample(y, sr, self.sample_rate)
+                sr = self.sample_rate
+        except RuntimeError:
+            # soundfile이 열지 못하는 포맷은 librosa(audioread)로 fallback
+            y, sr = librosa.load(file_path, sr=self.sample_rate, mono=False, dtype=np.float32)
+            # librosa의 (channels, samples)를 (samples, channels)로 변환
+            y = np.atleast_2d(y).T
         
         # 스테레오로 변환 (모노인 경우)
-        if y.ndim == 1:
-            y = np.stack([y, y])
+        if y.shape[1] == 1:
+            y = np.repeat(y, 2, axis=1)
         
-        return y, sr
+        # 한 샘플의 두 채널이 메모리상 연속으로 놓여 sf.write 전에 전치가 필요 없음
+        # float32로 고정해 이후 모든 믹싱 연산이 float64로 승격되지 않도록 함
+        return np.ascontiguousarray(y, dtype=np.float32), sr
     
     def match_tempo(self, audio: np.ndarray, original_bpm: float, target_bpm: float) -> np.ndarray:
         """
@@ -49,7 +416,7 @@ class AdvancedMixer:
         Returns:
             템포가 조정된 오디오
         """
-        if abs(original_bpm - target_bpm) < 0.5:
+        if abs(original_bpm - target_bpm) < self.TEMPO_TOLERANCE_BPM:
             print(f"  ⏭️  Tempo already matched ({original_bpm:.1f} BPM)")
             return audio
         
@@ -57,15 +424,12 @@ class AdvancedMixer:
         print(f"  🎚️  Stretching tempo: {original_bpm:.1f} → {target_bpm:.1f} BPM (rate: {rate:.3f})")
         
         # pyrubberband로 고품질 time-stretching
-        # 스테레오 처리
-        if audio.ndim == 2:
-            stretched = np.zeros_like(audio)
-            for ch in range(audio.shape[0]):
-                stretched[ch] = pyrb.time_stretch(audio[ch], self.sample_rate, rate)
-        else:
-            stretched = pyrb.time_stretch(audio, self.sample_rate, rate)
+        # (samples, channels) 배열을 그대로 넘기면 rubberband가 한 번의 호출로
+        # 모든 채널을 함께 처리 (채널 간 위상 유지, 서브프로세스 1개)
+        stretched = pyrb.time_stretch(audio, self.sample_rate, rate)
         
-        return stretched
+        # pyrubberband는 float64를 반환하므로 float32로 되돌림
+        return stretched.astype(np.float32, copy=False)
     
     def align_beats(self, audio1: np.ndarray, audio2: np.ndarray, 
                     beats1: np.ndarray, beats2: np.ndarray,
@@ -87,8 +451,7 @@ class AdvancedMixer:
         
         # 전환 지점에서 가장 가까운 비트 찾기
         if len(beats1) > 0:
-            closest_beat1_idx = np.argmin(np.abs(beats1 - transition_point))
-            aligned_point1 = beats1[closest_beat1_idx]
+            aligned_point1 = _nearest_beat(beats1, transition_point)
         else:
             aligned_point1 = transition_point
         
@@ -127,8 +490,7 @@ class AdvancedMixer:
         
         # 비트에 맞춰 조정
         if len(analysis1['beats']) > 0:
-            closest_beat_idx = np.argmin(np.abs(analysis1['beats'] - mixout_point))
-            mixout_point = analysis1['beats'][closest_beat_idx]
+            mixout_point = _nearest_beat(analysis1['beats'], mixout_point)
         
         print(f"  ✓ Transition points: Track1 @ {mixout_point:.2f}s, Track2 @ {mixin_point:.2f}s")
         
@@ -142,8 +504,8 @@ class AdvancedMixer:
         크로스페이드 생성
         
         Args:
-            audio1: 첫 번째 오디오
-            audio2: 두 번째 오디오
+            audio1: 첫 번째 오디오 (samples, channels)
+            audio2: 두 번째 오디오 (samples, channels)
             mixout_point: Track1 믹스 아웃 시작점
             mixin_point: Track2 믹스 인 시작점
             crossfade_duration: 크로스페이드 길이 (초)
@@ -154,6 +516,10 @@ class AdvancedMixer:
         """
         print(f"  🎛️  Creating {style} crossfade ({crossfade_duration:.1f}s)...")
         
+        # Numba 커널 시그니처(float32)에 맞춤 (이미 float32면 복사 없음)
+        audio1 = np.asarray(audio1, dtype=np.float32)
+        audio2 = np.asarray(audio2, dtype=np.float32)
+        
         # 샘플 단위로 변환
         mixout_sample = int(mixout_point * self.sample_rate)
         mixin_sample = int(mixin_point * self.sample_rate)
@@ -164,153 +530,125 @@ class AdvancedMixer:
         
         # 최종 길이 계산
         total_length = max(
-            audio1.shape[1],
-            track2_start_in_mix + (audio2.shape[1] - mixin_sample)
+            audio1.shape[0],
+            track2_start_in_mix + (audio2.shape[0] - mixin_sample)
         )
         
-        # 출력 버퍼 생성 (스테레오)
-        mixed = np.zeros((2, total_length), dtype=np.float32)
-        
-        # Track1 복사 (전체)
-        mixed[:, :audio1.shape[1]] = audio1
-        
         # 크로스페이드 구간 계산
         fade_start = mixout_sample
-        fade_end = min(fade_start + fade_samples, audio1.shape[1])
+        fade_end = min(fade_start + fade_samples, audio1.shape[0])
         actual_fade_samples = fade_end - fade_start
         
-        if style == 'classic':
-            # Classic crossfade
-            fade_out_curve = np.linspace(1, 0, actual_fade_samples)
-            fade_in_curve = np.linspace(0, 1, actual_fade_samples)
-            
-            # Track1 페이드 아웃
-            for ch in range(2):
-                mixed[ch, fade_start:fade_end] *= fade_out_curve
-            
-            # Track2 추가 (페이드 인)
-            track2_fade_start = mixin_sample
-            track2_fade_end = min(track2_fade_start + actual_fade_samples, audio2.shape[1])
-            track2_fade_samples = track2_fade_end - track2_fade_start
-            
-            for ch in range(2):
-                fade_in_actual = np.linspace(0, 1, track2_fade_samples)
-                mixed[ch, fade_start:fade_start + track2_fade_samples] += \
-                    audio2[ch, track2_fade_start:track2_fade_end] * fade_in_actual
-            
-            # Track2 나머지 부분
-            remaining_start = fade_start + track2_fade_samples
-            remaining_audio2_start = track2_fade_end
-            remaining_length = min(
-                audio2.shape[1] - remaining_audio2_start,
-                total_length - remaining_start
-            )
-            
-            if remaining_length > 0:
-                mixed[:, remaining_start:remaining_start + remaining_length] = \
-                    audio2[:, remaining_audio2_start:remaining_audio2_start + remaining_length]
+        # 출력 버퍼 생성 (스테레오)
+        # 0으로 채우지 않음: 모든 구간을 아래에서 한 번씩만 기록
+        mixed = np.empty((total_length, 2), dtype=np.float32)
         
-        elif style == 'bass_swap':
-            # Bass swap: 저음 먼저 교체
-            print("    🔊 Applying bass swap...")
-            
-            # 저음/고음 분리 (간단한 필터)
-            # Track1 저음 페이드 아웃
-            fade_out_curve = np.linspace(1, 0, actual_fade_samples)
-            for ch in range(2):
-                mixed[ch, fade_start:fade_end] *= fade_out_curve
-            
-            # Track2 저음 먼저 페이드 인 (빠르게)
-            bass_fade_samples = actual_fade_samples // 2
-            track2_fade_start = mixin_sample
-            
-            for ch in range(2):
-                bass_fade_in = np.linspace(0, 1, bass_fade_samples)
-                mixed[ch, fade_start:fade_start + bass_fade_samples] += \
-                    audio2[ch, track2_fade_start:track2_fade_start + bass_fade_samples] * bass_fade_in
-            
-            # 나머지 주파수 페이드 인
-            remaining_fade_samples = actual_fade_samples - bass_fade_samples
-            for ch in range(2):
-                remaining_fade_in = np.linspace(0, 1, remaining_fade_samples)
-                mixed[ch, fade_start + bass_fade_samples:fade_end] += \
-                    audio2[ch, track2_fade_start + bass_fade_samples:track2_fade_start + actual_fade_samples] * remaining_fade_in
-            
-            # Track2 나머지
-            remaining_start = fade_end
-            remaining_audio2_start = track2_fade_start + actual_fade_samples
-            remaining_length = min(
-                audio2.shape[1] - remaining_audio2_start,
-                total_length - remaining_start
-            )
-            
-            if remaining_length > 0:
-                mixed[:, remaining_start:remaining_start + remaining_length] = \
-                    audio2[:, remaining_audio2_start:remaining_audio2_start + remaining_length]
-        
-        else:  # filter_sweep or other
-            # 기본 classic 사용
-            fade_out_curve = np.linspace(1, 0, actual_fade_samples)
-            fade_in_curve = np.linspace(0, 1, actual_fade_samples)
-            
-            for ch in range(2):
-                mixed[ch, fade_start:fade_end] *= fade_out_curve
-            
-            track2_fade_start = mixin_sample
-            track2_fade_end = min(track2_fade_start + actual_fade_samples, audio2.shape[1])
-            track2_fade_samples = track2_fade_end - track2_fade_start
-            
-            for ch in range(2):
-                fade_in_actual = np.linspace(0, 1, track2_fade_samples)
-                mixed[ch, fade_start:fade_start + track2_fade_samples] += \
-                    audio2[ch, track2_fade_start:track2_fade_end] * fade_in_actual
-            
-            remaining_start = fade_start + track2_fade_samples
-            remaining_audio2_start = track2_fade_end
-            remaining_length = min(
-                audio2.shape[1] - remaining_audio2_start,
-                total_length - remaining_start
-            )
-            
-            if remaining_length > 0:
-                mixed[:, remaining_start:remaining_start + remaining_length] = \
-                    audio2[:, remaining_audio2_start:remaining_audio2_start + remaining_length]
+        # Track1 복사 (페이드 이전 구간만, 페이드 구간은 각 스타일에서 audio1을 직접 읽어 기록)
+        mixed[:fade_start] = audio1[:fade_start]
+        
+        # Equal-power 커브는 한 번만 계산해서 두 트랙에 공통 사용
+        fade_out_curve, fade_in_curve = _equal_power_curves(actual_fade_samples)
+        
+        # Track2에서 페이드 구간에 겹치는 부분 (Track2가 짧으면 페이드보다 짧을 수 있음)
+        track2_fade_start = mixin_sample
+        track2_fade_end = min(track2_fade_start + actual_fade_samples, audio2.shape[0])
+        track2_fade_samples = track2_fade_end - track2_fade_start
+        
+        # 스타일별 페이드 구간 처리 (filter_sweep 등 미구현 스타일은 classic 사용)
+        crossfade_impl = _CROSSFADE_IMPL.get(style, _classic_crossfade)
+        crossfade_impl(mixed, audio1, audio2, fade_out_curve, fade_in_curve,
+                       fade_start, track2_fade_start, track2_fade_samples, self.sample_rate)
+        
+        # Track2 나머지 부분
+        remaining_start = fade_start + track2_fade_samples
+        remaining_length = _copy_tail(mixed, audio2, remaining_start, track2_fade_end, total_length)
+        
+        # Track2가 끝난 뒤 남는 구간은 무음 (Track1은 이미 페이드 아웃됨)
+        written_end = max(fade_end, remaining_start + remaining_length)
+        mixed[written_end:] = 0
         
         print(f"  ✓ Crossfade complete: {total_length / self.sample_rate:.2f}s total")
         
         return mixed
     
+    @staticmethod
+    def linear_crossfade_inplace(mixed: np.ndarray, incoming: np.ndarray, fade_start: int, n: int):
+        """
+        mixed의 fade_start부터 n 샘플을 선형 페이드 아웃하면서 incoming 앞 n 샘플을 페이드 인해 제자리에 기록
+        
+        추가 버퍼 없이 한 번의 패스로 처리 (MusicExtender의 루프 접합부 등)
+        
+        Args:
+            mixed: 기록 대상 float32 (samples, channels) 버퍼
+            incoming: 이어 붙일 float32 (samples, channels) 오디오 (n 샘플 이상)
+            fade_start: mixed에서 겹침이 시작되는 샘플 위치
+            n: 겹치는 샘플 수
+        """
+        fade_out, fade_in = _linear_curves(n)
+        _fused_crossfade(mixed, mixed, incoming, fade_out, fade_in, fade_start, 0, n)
+    
     def normalize_audio(self, audio: np.ndarray, target_db: float = -14.0) -> np.ndarray:
         """
-        오디오 정규화
+        오디오 라우드니스 정규화 (ITU-R BS.1770 integrated loudness 기준)
         
         Args:
-            audio: 오디오 데이터
-            target_db: 목표 dB 레벨
+            audio: 오디오 데이터 (samples, channels)
+            target_db: 목표 라우드니스 (LUFS, 스트리밍 기준 -14)
             
         Returns:
-            정규화된 오디오
+            정규화된 오디오 (float32 입력이면 제자리에서 스케일)
         """
-        # RMS 계산
-        rms = np.sqrt(np.mean(audio ** 2))
+        # 라우드니스와 피크를 한 번의 패스로 측정
+        audio = np.asarray(audio, dtype=np.float32)
+        meter = _LoudnessMeter(self.sample_rate, audio.shape[1])
+        meter.feed(audio)
         
-        if rms > 0:
-            current_db = 20 * np.log10(rms)
-            gain_db = target_db - current_db
-            gain_linear = 10 ** (gain_db / 20)
-            
-            normalized = audio * gain_linear
-            
-            # 클리핑 방지
-            max_val = np.max(np.abs(normalized))
-            if max_val > 1.0:
-                normalized = normalized / max_val * 0.99
-            
-            print(f"  🔊 Normalized: {current_db:.1f} dB → {target_db:.1f} dB")
-            return normalized
+        gain_linear = self._normalization_gain(meter.integrated_loudness(), meter.peak, target_db)
+        if gain_linear != 1.0:
+            audio *= np.float32(gain_linear)
         
         return audio
     
+    def _normalization_gain(self, loudness: float, max_abs: float, target_db: float) -> float:
+        """
+        측정된 라우드니스/피크로 정규화 게인 계산
+        
+        Returns:
+            선형 게인 (무음이면 1.0)
+        """
+        if not np.isfinite(loudness) or max_abs <= 0:
+            return 1.0
+        
+        gain_db = target_db - loudness
+        gain_linear = 10 ** (gain_db / 20)
+        
+        # 클리핑 방지: 피크가 넘칠 경우 게인 자체를 낮춰 곱셈을 한 번만 수행
+        if max_abs * gain_linear > 1.0:
+            gain_linear = 0.99 / max_abs
+        
+        print(f"  🔊 Normalized: {loudness:.1f} LUFS → {target_db:.1f} LUFS")
+        return gain_linear
+    
+    def _normalize_file(self, input_path: str, output_path: str,
+                        loudness: float, max_abs: float, target_db: float = -14.0):
+        """
+        스트리밍 정규화 - input_path를 1초 단위 블록으로 읽어 게인을 적용하고 output_path로 기록
+        
+        Args:
+            input_path: 정규화 전 오디오 파일
+            output_path: 출력 파일 경로
+            loudness: input_path 전체의 integrated loudness (LUFS)
+            max_abs: input_path 전체의 절대값 최대치
+            target_db: 목표 라우드니스 (LUFS)
+        """
+        gain_linear = np.float32(self._normalization_gain(loudness, max_abs, target_db))
+        
+        with sf.SoundFile(input_path) as src, \
+                sf.SoundFile(output_path, 'w', src.samplerate, src.channels) as dst:
+            for block in src.blocks(blocksize=self.sample_rate, dtype='float32'):
+                block *= gain_linear
+                dst.write(block)
+    
     def mix(self, track1_path: str, track2_path: str, output_path: str,
             sync_beats: bool = True,
             match_tempo: bool = True,
@@ -331,7 +669,8 @@ class AdvancedMixer:
                     harmonic_mix: bool = True,
                     transition_bars: int = 16,
                     transition_style: str = 'classic',
-                    auto_detect: bool = True) -> str:
+                    auto_detect: bool = True,
+                    in_process: bool = False) -> str:
         """
         여러 트랙을 순차적으로 믹싱 (플레이리스트 방식)
         
@@ -339,6 +678,8 @@ class AdvancedMixer:
             track_paths: 트랙 파일 경로 목록
             output_path: 출력 파일 경로
             ... (기타 옵션은 mix와 동일)
+            in_process: True면 트랙 분석을 별도 프로세스 풀 없이 현재 프로세스에서 순서대로 수행
+                        (이미 프로세스 풀 워커 안에서 호출될 때 - 풀 중첩과 CPU 과점유 방지)
         """
         if not track_paths:
             raise ValueError("No tracks provided for mixing")
@@ -346,21 +687,96 @@ class AdvancedMixer:
         if len(track_paths) == 1:
             # 트랙이 하나면 그냥 복사(포맷 변환)만 함
             audio, sr = self.load_audio(track_paths[0])
-            sf.write(output_path, audio.T, self.sample_rate)
+            sf.write(output_path, audio, self.sample_rate)
             return output_path
 
         print(f"\n{'='*70}")
         print(f"🎧 Playlist Mixing ({len(track_paths)} tracks)")
         print(f"{'='*70}\n")
 
+        # 트랙 로드/분석(비트 트래킹, CQT 등 CPU 작업)은 서로 독립적이므로
+        # 프로세스 풀에서 여러 트랙을 앞서 병렬로 진행, 믹싱은 도착한 순서대로 수행
+        # (fork는 Numba 병렬 스레드 풀과 충돌할 수 있어 spawn으로 워커 생성)
+        if in_process:
+            workers, executor = 1, _InlineExecutor()
+        else:
+            workers = min(os.cpu_count() or 1, self.PREFETCH_TRACKS, len(track_paths))
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=multiprocessing.get_context('spawn'))
+        pending = [executor.submit(self._load_and_analyze, path) for path in track_paths[:workers + 1]]
+        
+        # 더 이상 믹싱되지 않는 구간은 바로 임시 파일(float32)로 내보내서
+        # 메모리에는 다음 전환에 필요한 뒷부분만 유지, 마지막에 다시 읽으면서 정규화
+        fd, staging_path = tempfile.mkstemp(
+            suffix='.wav', dir=os.path.dirname(os.path.abspath(output_path))
+        )
+        os.close(fd)
+        
+        try:
+            with sf.SoundFile(staging_path, 'w', self.sample_rate, 2, subtype='FLOAT') as staging:
+                meter = self._mix_playlist_tracks(
+                    track_paths, staging, executor, pending,
+                    sync_beats, match_tempo, harmonic_mix,
+                    transition_bars, transition_style, auto_detect
+                )
+            
+            # 최종 정규화 (스트리밍)
+            self._normalize_file(staging_path, output_path,
+                                 meter.integrated_loudness(), meter.peak)
+        finally:
+            executor.shutdown(cancel_futures=True)
+            if os.path.exists(staging_path):
+                os.unlink(staging_path)
+        
+        print(f"\n✅ All {len(track_paths)} tracks mixed successfully!")
+        
+        return output_path
+    
+    def _load_and_analyze(self, track_path: str) -> Tuple[np.ndarray, Dict]:
+        """
+        트랙 로드 및 분석 (프로세스 풀 작업 단위)
+        
+        Returns:
+            (audio_data, analysis)
+        """
+        # 한 번만 디코딩해서 믹싱용 스테레오와 분석용 모노에 함께 사용
+        audio, sr = self.load_audio(track_path)
+        analysis = AudioAnalyzer.from_array(audio, sr, track_path).analyze_full()
+        return audio, analysis
+    
+    def _mix_playlist_tracks(self, track_paths: list, staging: sf.SoundFile,
+                             executor: Executor, pending: list,
+                             sync_beats: bool, match_tempo: bool, harmonic_mix: bool,
+                             transition_bars: int, transition_style: str,
+                             auto_detect: bool) -> '_LoudnessMeter':
+        """
+        mix_playlist 본체 - pending[i]는 track_paths[i]의 (audio, analysis) Future
+        
+        확정된 구간을 staging 파일에 순서대로 기록하면서 정규화용 라우드니스를 측정
+        
+        Returns:
+            기록된 전체 믹스를 측정한 _LoudnessMeter
+        """
+        meter = _LoudnessMeter(self.sample_rate, staging.channels)
+        
+        def write_final(block: np.ndarray):
+            if block.shape[0] == 0:
+                return
+            meter.feed(block)
+            staging.write(block)
+        
         # 첫 번째 트랙 로드 및 초기화
-        current_audio, sr = self.load_audio(track_paths[0])
-        analyzer = AudioAnalyzer(track_paths[0])
-        current_analysis = analyzer.analyze_full()
+        # (받은 Future는 목록에서 지워 디코딩된 트랙이 믹싱 끝까지 메모리에 남지 않게 함)
+        current_audio, current_analysis = pending[0].result()
+        pending[0] = None
         
         # 첫 번째 트랙 정규화
         current_audio = self.normalize_audio(current_audio)
         
+        # current_audio는 아직 기록되지 않은 믹스의 뒷부분, written은 이미 기록된 샘플 수
+        # (분석 데이터의 시간값은 믹스 전체 기준)
+        written = 0
+        
         # 템포 기준 (첫 트랙 또는 평균으로 설정 가능, 여기선 첫 트랙 기준)
         reference_bpm = current_analysis['bpm']
 
@@ -368,17 +784,20 @@ class AdvancedMixer:
             next_track_path = track_paths[i]
             print(f"\n📎 Mixing in Track {i+1}: {os.path.basename(next_track_path)}")
             
-            # 다음 트랙 분석 및 로드
-            next_analyzer = AudioAnalyzer(next_track_path)
-            next_analysis = next_analyzer.analyze_full()
-            next_audio, sr_next = self.load_audio(next_track_path)
+            # 다음 트랙 분석 및 로드 (미리 시작된 작업 결과 대기), 빈 워커에는 뒤 트랙을 이어서 시작
+            next_audio, next_analysis = pending[i].result()
+            pending[i] = None
+            if len(pending) < len(track_paths):
+                pending.append(executor.submit(self._load_and_analyze, track_paths[len(pending)]))
             
             # 템포 매칭 (이전 트랙의 BPM에 맞춤)
-            if match_tempo:
+            # (BPM 차이가 허용 범위 이내면 스트레칭과 비트 재계산 모두 생략)
+            if match_tempo and abs(next_analysis['bpm'] - reference_bpm) >= self.TEMPO_TOLERANCE_BPM:
                 next_audio = self.match_tempo(next_audio, next_analysis['bpm'], reference_bpm)
-                # 비트 정보 업데이트
+                # 비트 정보 업데이트 (제자리 연산)
                 tempo_ratio = reference_bpm / next_analysis['bpm']
-                next_analysis['beats'] = next_analysis['beats'] / tempo_ratio
+                beats = np.asarray(next_analysis['beats'], dtype=np.float64)
+                next_analysis['beats'] = np.divide(beats, tempo_ratio, out=beats)
 
             # 하모닉 체크 (참고용)
             if harmonic_mix:
@@ -390,7 +809,7 @@ class AdvancedMixer:
                 mixout_point, mixin_point = self.find_optimal_transition_point(current_analysis, next_analysis, transition_bars)
             else:
                 bars_duration = (60 / reference_bpm) * 4 * transition_bars
-                mixout_point = (current_audio.shape[1] / self.sample_rate) - bars_duration
+                mixout_point = ((written + current_audio.shape[0]) / self.sample_rate) - bars_duration
                 mixin_point = 0
 
             # 비트 정렬
@@ -404,10 +823,15 @@ class AdvancedMixer:
             # 크로스페이드 생성
             crossfade_duration = (60 / reference_bpm) * 4 * transition_bars
             
+            # 믹스아웃 지점 이전은 더 이상 바뀌지 않으므로 파일로 내보내고 메모리에서 해제
+            mixout_sample = max(int(mixout_point * self.sample_rate) - written, 0)
+            write_final(current_audio[:mixout_sample])
+            written += mixout_sample
+            
             # mixout_point 이후의 beats는 audio2의 beats로 대체되거나 offset 되어야 함 (여기선 단순 누적)
             current_audio = self.create_crossfade(
-                current_audio, next_audio,
-                mixout_point, mixin_point,
+                current_audio[mixout_sample:], next_audio,
+                0.0, mixin_point,
                 crossfade_duration,
                 transition_style
             )
@@ -428,16 +852,13 @@ class AdvancedMixer:
                 'camelot': next_analysis['camelot']
             }
             
-            print(f"  ✓ Track {i+1} merged. Current total length: {current_audio.shape[1]/self.sample_rate:.1f}s")
+            total_length = (written + current_audio.shape[0]) / self.sample_rate
+            print(f"  ✓ Track {i+1} merged. Current total length: {total_length:.1f}s")
 
-        # 최종 정규화
-        current_audio = self.normalize_audio(current_audio)
-        
-        # 저장
-        sf.write(output_path, current_audio.T, self.sample_rate)
-        print(f"\n✅ All {len(track_paths)} tracks mixed successfully!")
+        # 마지막 트랙의 남은 부분 기록
+        write_final(current_audio)
         
-        return output_path
+        return meter
 
 
 if __name__ == "__main__":
@@ -5,10 +5,62 @@ Advanced Audio Analyzer
 
 import librosa
 import numpy as np
+import soundfile as sf
+import soxr
 from scipy import signal
+from numba import njit
 from typing import Dict, Tuple, List
 
 
+@njit('int64(float32[:], float64)', fastmath=True, cache=True)
+def _first_frame_above(energy_curve, threshold):
+    """
+    energy_curve에서 threshold를 처음 넘는 프레임 인덱스 (없으면 -1)
+    """
+    for i in range(energy_curve.shape[0]):
+        if energy_curve[i] > threshold:
+            return i
+    return -1
+
+
+# Camelot 관계 코드 → (호환 여부, 설명)
+_CAMELOT_RELATIONS = (
+    (False, "Incompatible keys"),
+    (True, "Perfect match (same key)"),
+    (True, "Relative major/minor"),
+    (True, "Adjacent key (±1 semitone)"),
+    (False, "Unknown key"),
+)
+_UNKNOWN_RELATION = len(_CAMELOT_RELATIONS) - 1
+
+
+def _build_camelot_table(codes: List[str]) -> np.ndarray:
+    """
+    Camelot 코드 쌍의 관계 코드 테이블 생성 (_CAMELOT_RELATIONS 인덱스)
+    
+    마지막 행/열은 알 수 없는 키용 (항상 "Unknown key")
+    
+    Returns:
+        (len(codes) + 1, len(codes) + 1) uint8 배열
+    """
+    n = len(codes)
+    table = np.full((n + 1, n + 1), _UNKNOWN_RELATION, dtype=np.uint8)
+    for i, code1 in enumerate(codes):
+        num1, letter1 = int(code1[:-1]), code1[-1]
+        for j, code2 in enumerate(codes):
+            num2, letter2 = int(code2[:-1]), code2[-1]
+            if code1 == code2:
+                relation = 1
+            elif num1 == num2:
+                relation = 2
+            elif letter1 == letter2 and (num1 - num2) % 12 in (1, 11):
+                relation = 3
+            else:
+                relation = 0
+            table[i, j] = relation
+    return table
+
+
 class AudioAnalyzer:
     """전문가급 오디오 분석 클래스"""
     
@@ -28,6 +80,11 @@ class AudioAnalyzer:
         'F major': '7B', 'D minor': '7A',
     }
     
+    # Camelot 코드 → 인덱스, 코드 쌍 관계 테이블 (호환성 검사를 테이블 조회 한 번으로 처리)
+    CAMELOT_CODES = list(CAMELOT_WHEEL.values())
+    CAMELOT_INDEX = {code: i for i, code in enumerate(CAMELOT_CODES)}
+    COMPAT_TABLE = _build_camelot_table(CAMELOT_CODES)
+    
     KEY_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
     
     def __init__(self, audio_path: str):
@@ -39,10 +96,68 @@ class AudioAnalyzer:
         """
         print(f"🎵 Loading audio: {audio_path}")
         self.audio_path = audio_path
-        self.y, self.sr = librosa.load(audio_path, sr=44100, mono=True)
+        self.y, self.sr = self._load_mono(audio_path, 44100)
         self.duration = librosa.get_duration(y=self.y, sr=self.sr)
+        self._y_low = None
         print(f"✓ Loaded {self.duration:.2f} seconds at {self.sr} Hz")
     
+    @classmethod
+    def from_array(cls, audio: np.ndarray, sr: int, audio_path: str = None) -> 'AudioAnalyzer':
+        """
+        이미 디코딩된 오디오로 분석기 생성 (파일을 다시 디코딩하지 않음)
+        
+        Args:
+            audio: 오디오 데이터 (samples,) 또는 (samples, channels)
+            sr: 샘플레이트
+            audio_path: 결과에 기록할 원본 파일 경로
+        """
+        analyzer = cls.__new__(cls)
+        analyzer.audio_path = audio_path
+        
+        # 채널 평균으로 모노 다운믹스 (파일 로드 경로와 동일)
+        audio = np.asarray(audio, dtype=np.float32)
+        if audio.ndim == 2:
+            audio = audio.mean(axis=1, dtype=np.float32)
+        analyzer.y, analyzer.sr = np.ascontiguousarray(audio), sr
+        analyzer.duration = librosa.get_duration(y=analyzer.y, sr=analyzer.sr)
+        analyzer._y_low = None
+        return analyzer
+    
+    @staticmethod
+    def _load_mono(audio_path: str, sample_rate: int) -> Tuple[np.ndarray, int]:
+        """
+        모노 float32로 로드 (soundfile 디코딩, 샘플레이트가 다를 때만 리샘플링)
+        
+        Returns:
+            (y, sr)
+        """
+        try:
+            y, sr = sf.read(audio_path, dtype='float32', always_2d=True)
+            # librosa.load(mono=True)와 같은 채널 평균 다운믹스
+            y = y.mean(axis=1, dtype=np.float32)
+            if sr != sample_rate:
+                y = soxr.resample(y, sr, sample_rate)
+                sr = sample_rate
+        except RuntimeError:
+            # soundfile이 열지 못하는 포맷은 librosa(audioread)로 fallback
+            y, sr = librosa.load(audio_path, sr=sample_rate, mono=True, dtype=np.float32)
+        
+        return np.ascontiguousarray(y, dtype=np.float32), sr
+    
+    # 비트/키 분석용 샘플레이트 (onset, chroma는 고역 정보가 거의 필요 없음)
+    LOW_SR = 22050
+    # LOW_SR에서 44.1kHz의 n_fft=2048, hop=512와 같은 시간 길이 (onset 프레임 레이트/템포 격자 유지)
+    BEAT_N_FFT = 1024
+    BEAT_HOP = 256
+    
+    def _downsampled(self) -> np.ndarray:
+        """
+        LOW_SR로 낮춘 모노 신호 (한 번만 리샘플링해서 비트/키 분석에 공통 사용)
+        """
+        if self._y_low is None:
+            self._y_low = soxr.resample(self.y, self.sr, self.LOW_SR) if self.sr != self.LOW_SR else self.y
+        return self._y_low
+    
     def analyze_tempo_and_beats(self) -> Dict:
         """
         BPM과 비트 그리드 분석
@@ -52,14 +167,19 @@ class AudioAnalyzer:
         """
         print("🎼 Analyzing tempo and beats...")
         
-        # Tempo 추정
-        tempo, beat_frames = librosa.beat.beat_track(y=self.y, sr=self.sr, units='frames')
-        beat_times = librosa.frames_to_time(beat_frames, sr=self.sr)
+        # Onset strength: 다운샘플링한 신호에서 beat_track 기본값과 같은 방식으로 계산
+        # (onset 검출은 ~8kHz 이상 대역에 둔감하므로 FFT 연산량만 절반으로 줄어듦)
+        # 프레임 길이/간격은 샘플 수를 절반으로 줄여 44.1kHz 기준과 같은 11.6ms 프레임 레이트 유지
+        y_beat = self._downsampled()
+        onset_env = librosa.onset.onset_strength(y=y_beat, sr=self.LOW_SR, aggregate=np.median,
+                                                 n_fft=self.BEAT_N_FFT, hop_length=self.BEAT_HOP)
         
-        # Downbeat 감지 (강박)
-        # 더 정확한 분석을 위해 onset strength 사용
-        onset_env = librosa.onset.onset_strength(y=self.y, sr=self.sr)
+        # Tempo 추정 (beat_frames는 BEAT_HOP 간격 프레임, 시간은 초 단위로 변환)
+        tempo, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env, sr=self.LOW_SR,
+                                                     hop_length=self.BEAT_HOP, units='frames')
+        beat_times = librosa.frames_to_time(beat_frames, sr=self.LOW_SR, hop_length=self.BEAT_HOP)
         
+        # Downbeat 감지 (강박)
         # 4/4 박자 가정하여 downbeat 추정
         if len(beat_times) >= 4:
             # 비트 간격 분석
@@ -92,7 +212,9 @@ class AudioAnalyzer:
         print("🎹 Analyzing key and scale...")
         
         # Chromagram 계산
-        chroma = librosa.feature.chroma_cqt(y=self.y, sr=self.sr)
+        # 곡 전체 평균만 쓰므로 시간 해상도는 필요 없음: LOW_SR 신호에 큰 hop으로 CQT 연산량 절감
+        chroma = librosa.feature.chroma_cqt(y=self._downsampled(), sr=self.LOW_SR,
+                                            hop_length=4096, n_chroma=12)
         
         # 평균 chroma 벡터
         chroma_mean = np.mean(chroma, axis=1)
@@ -138,7 +260,7 @@ class AudioAnalyzer:
         """
         print("⚡ Analyzing energy levels...")
         
-        # RMS 에너지
+        # RMS 에너지 (시간 영역 프레임에서 바로 계산 - FFT 불필요, 기존 에너지 지표/드롭 임계값 유지)
         rms = librosa.feature.rms(y=self.y)[0]
         
         # Spectral centroid (밝기/에너지 지표)
@@ -190,10 +312,11 @@ class AudioAnalyzer:
         if len(energy_curve) > 0:
             # 에너지가 평균보다 높은 구간
             high_energy_threshold = energy_info['avg_energy'] * 1.2
-            high_energy_frames = np.where(energy_curve > high_energy_threshold)[0]
+            drop_frame = _first_frame_above(
+                np.asarray(energy_curve, dtype=np.float32), high_energy_threshold
+            )
             
-            if len(high_energy_frames) > 0:
-                drop_frame = high_energy_frames[0]
+            if drop_frame >= 0:
                 drop_time = librosa.frames_to_time(drop_frame, sr=self.sr)
                 
                 # 빌드업은 드롭 직전
@@ -268,27 +391,28 @@ class AudioAnalyzer:
         Returns:
             (호환 여부, 설명)
         """
-        if camelot1 == 'Unknown' or camelot2 == 'Unknown':
-            return False, "Unknown key"
-        
-        # 같은 키
-        if camelot1 == camelot2:
-            return True, "Perfect match (same key)"
-        
-        # 숫자와 문자 분리
-        num1, letter1 = int(camelot1[:-1]), camelot1[-1]
-        num2, letter2 = int(camelot2[:-1]), camelot2[-1]
-        
-        # 같은 숫자, 다른 문자 (relative major/minor)
-        if num1 == num2 and letter1 != letter2:
-            return True, "Relative major/minor"
-        
-        # ±1 숫자 (같은 문자)
-        if letter1 == letter2:
-            if (num1 + 1) % 12 == num2 % 12 or (num1 - 1) % 12 == num2 % 12:
-                return True, "Adjacent key (±1 semitone)"
+        unknown = len(AudioAnalyzer.CAMELOT_CODES)
+        relation = AudioAnalyzer.COMPAT_TABLE[
+            AudioAnalyzer.CAMELOT_INDEX.get(camelot1, unknown),
+            AudioAnalyzer.CAMELOT_INDEX.get(camelot2, unknown)
+        ]
+        return _CAMELOT_RELATIONS[relation]
+    
+    @staticmethod
+    def compatibility_matrix(camelot_codes: List[str]) -> np.ndarray:
+        """
+        트랙 전체 쌍의 하모닉 호환 여부를 한 번에 계산 (플레이리스트 순서 최적화용)
         
-        return False, "Incompatible keys"
+        Args:
+            camelot_codes: 각 트랙의 Camelot 코드
+            
+        Returns:
+            (N, N) bool 배열 - [i, j]는 i번 트랙에서 j번 트랙으로의 호환 여부
+        """
+        unknown = len(AudioAnalyzer.CAMELOT_CODES)
+        idx = np.array([AudioAnalyzer.CAMELOT_INDEX.get(c, unknown) for c in camelot_codes], dtype=np.intp)
+        compatible = np.array([ok for ok, _ in _CAMELOT_RELATIONS])
+        return compatible[AudioAnalyzer.COMPAT_TABLE[idx[:, None], idx[None, :]]]
 
 
 if __name__ == "__main__":
@@ -16,8 +16,21 @@ VALID_API_KEYS = {
 
 # Rate Limiting (메모리 저장소)
 # Key: api_key, Value: {date: "YYYY-MM-DD", count: 10}
+# - 검증을 통과한 키만 항목이 생기므로 크기는 VALID_API_KEYS 수로 제한됨
+# - get_api_key는 이벤트 루프에서 await 없이 읽기-수정-쓰기를 끝내므로 별도 락이 필요 없음
+#   (await를 추가하거나 키를 DB에서 가져오게 되면 TTL 캐시 + asyncio.Lock으로 교체할 것)
 usage_tracker = defaultdict(lambda: {"date": "", "count": 0})
 
+# 오늘 날짜 캐시: [날짜 문자열, 계산 시각] - 요청마다 strftime(localtime)을 호출하지 않도록 60초마다 갱신
+_today_cache = ["", 0]
+
+def _today() -> str:
+    now = int(time.time())
+    if now - _today_cache[1] >= 60:
+        _today_cache[0] = time.strftime("%Y-%m-%d")
+        _today_cache[1] = now
+    return _today_cache[0]
+
 async def get_api_key(api_key: str = Security(api_key_header)):
     """API Key 검증 및 Rate Limiting"""
     
@@ -41,7 +54,7 @@ async def get_api_key(api_key: str = Security(api_key_header)):
     tier_info = VALID_API_KEYS[api_key]
     limit = tier_info["daily_limit"]
     
-    today = time.strftime("%Y-%m-%d")
+    today = _today()
     user_usage = usage_tracker[api_key]
     
     # 날짜가 바뀌었으면 카운트 리셋
@@ -1,21 +1,30 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, Depends
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Depends, Request
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import shutil
+import aiofiles
 import os
 import uuid
 import sys
+import time
+import heapq
+import hashlib
 import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
+import io
+import contextlib
+import numpy as np
+import numba
 
 # Add parent directory to path to import existing modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from audio_analyzer import AudioAnalyzer
 from advanced_mixer import AdvancedMixer
-from music_extender import MusicExtender
+from music_extender import MusicExtender, DURATION_PATTERN, IMAGE_EXTENSIONS
 from backend.auth import get_api_key
 
 app = FastAPI(title="DJ Web Station API", version="1.0.0")
@@ -38,79 +47,220 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 # 파일 유효기간 (초)
 FILE_TTL = 600  # 10분
 
+# file_id / output_id → 파일 경로 (요청마다 디렉터리를 glob하지 않도록 생성 시 등록, 삭제 시 제거)
+UPLOAD_INDEX: Dict[str, Path] = {}
+OUTPUT_INDEX: Dict[str, Path] = {}
+
+# file_id → analyze_full() 결과 (업로드 파일은 바뀌지 않으므로 분석/확장에서 재사용, 파일 만료 시 제거)
+ANALYSIS_CACHE: Dict[str, Dict] = {}
+
+# (작업 종류, 입력 file_id들, 파라미터) 해시 → output_id
+# 같은 요청이 다시 오면 (새로고침/뒤로가기 등) 결과 파일이 남아 있는 동안 다시 계산하지 않음
+RESULT_CACHE: Dict[str, str] = {}
+
 # --- Background Task: Auto Cleanup ---
+# (만료 시각, id, 경로) min-heap: 파일을 만들 때 등록하고, 가장 빨리 만료되는 파일 시각까지만 대기
+_expiry_heap: List[Tuple[float, str, Path]] = []
+# id → 현재 유효한 만료 시각 (다시 등록되어 만료가 연장된 경우 heap의 이전 항목은 무시)
+_expires_at: Dict[str, float] = {}
+
+def register_file(index: Dict[str, Path], file_id: str, path: Path, created: Optional[float] = None):
+    """파일을 인덱스에 등록하고 FILE_TTL 뒤에 삭제하도록 예약 (이미 등록된 id면 만료 연장)"""
+    path = Path(path)
+    index[file_id] = path
+    created = time.time() if created is None else created
+    _expires_at[file_id] = created + FILE_TTL
+    heapq.heappush(_expiry_heap, (created + FILE_TTL, file_id, path))
+
+def _store_analysis(file_id: str, path: Path, result: Dict):
+    # 풀에서 분석하는 동안 업로드가 만료되어 정리됐으면 이미 없는 파일의 결과를 다시 넣지 않음
+    if UPLOAD_INDEX.get(file_id) == path:
+        ANALYSIS_CACHE[file_id] = result
+
+def _result_key(kind: str, file_ids: List[str], **params) -> str:
+    payload = json.dumps({"kind": kind, "ids": file_ids, **params}, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+def _cached_result(key: str) -> Optional[str]:
+    """캐시된 결과가 아직 있으면 만료를 연장하고 output_id 반환"""
+    output_id = RESULT_CACHE.get(key)
+    path = OUTPUT_INDEX.get(output_id) if output_id else None
+    if path is None or not path.exists():
+        return None
+    os.utime(path, None)  # 재시작 시 수정 시각 기준으로 다시 등록되므로 함께 갱신
+    register_file(OUTPUT_INDEX, output_id, path)
+    return output_id
+
 async def cleanup_old_files():
     """오래된 파일 자동 삭제"""
     while True:
+        delay = min(60, FILE_TTL)  # 등록된 파일이 없으면 잠시 뒤 다시 확인
         try:
-            now = asyncio.get_event_loop().time()
-            # UPLOAD_DIR 청소
-            for f in UPLOAD_DIR.glob("*"):
-                if f.is_file() and (now - f.stat().st_mtime > FILE_TTL):
-                    f.unlink()
-                    print(f"🗑️ Cleaned up upload: {f.name}")
+            now = time.time()
+            while _expiry_heap and _expiry_heap[0][0] <= now:
+                expiry, file_id, path = heapq.heappop(_expiry_heap)
+                if _expires_at.get(file_id, expiry) > expiry:
+                    continue  # 만료가 연장된 파일
+                _expires_at.pop(file_id, None)
+                for index in (UPLOAD_INDEX, OUTPUT_INDEX):
+                    if index.get(file_id) == path:
+                        del index[file_id]
+                        ANALYSIS_CACHE.pop(file_id, None)
+                for key in [k for k, v in RESULT_CACHE.items() if v == file_id]:
+                    del RESULT_CACHE[key]
+                if path.exists():
+                    path.unlink()
+                    print(f"🗑️ Cleaned up: {path.name}")
             
-            # OUTPUT_DIR 청소
-            for f in OUTPUT_DIR.glob("*"):
-                if f.is_file() and (now - f.stat().st_mtime > FILE_TTL):
-                    f.unlink()
-                    print(f"🗑️ Cleaned up output: {f.name}")
+            if _expiry_heap:
+                delay = _expiry_heap[0][0] - now
                     
         except Exception as e:
             print(f"Cleanup error: {e}")
             
-        await asyncio.sleep(60)  # 1분마다 체크
+        await asyncio.sleep(delay)
 
 @app.on_event("startup")
 async def startup_event():
+    # 재시작 전에 남아 있던 파일도 수정 시각 기준으로 등록 (디렉터리당 scandir 한 번)
+    # 업로드는 "{file_id}.ext", 결과는 "{mixed|extended}_{output_id}.ext" 형식
+    for directory, index in ((UPLOAD_DIR, UPLOAD_INDEX), (OUTPUT_DIR, OUTPUT_INDEX)):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    stem = Path(entry.name).stem
+                    file_id = stem if index is UPLOAD_INDEX else stem.split('_', 1)[-1]
+                    register_file(index, file_id, Path(entry.path), entry.stat(follow_symlinks=False).st_mtime)
+    
+    # 이 프로세스는 advanced_mixer import 시 Numba 병렬 스레드 풀이 이미 떠 있으므로
+    # fork 대신 spawn으로 워커 생성 (mix_playlist의 프리페치 풀과 같은 이유)
+    workers = os.cpu_count() or 1
+    app.state.pool = ProcessPoolExecutor(max_workers=workers, initializer=_warmup_worker,
+                                         mp_context=multiprocessing.get_context('spawn'))
+    # spawn 풀은 워커를 필요할 때 하나씩 띄우므로 워커 수만큼 빈 작업을 넣어 지금 모두 띄우고 워밍업
+    for _ in range(workers):
+        app.state.pool.submit(int)
     asyncio.create_task(cleanup_old_files())
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.pool.shutdown(cancel_futures=True)
+
+
+class _ResultFileResponse(FileResponse):
+    # uvicorn ASGI에는 sendfile(zerocopysend) 경로가 없어 Starlette가 청크 단위로 읽어 보냄
+    # 기본 64KB 대신 1MB 청크로 읽어 수백 MB 결과 파일의 read/send 왕복 횟수를 줄임
+    # (FileResponse를 유지해 Content-Length와 Range 요청 - 비디오 탐색 - 지원은 그대로)
+    chunk_size = 1 << 20
+
+
+# --- Worker Jobs (프로세스 풀에서 실행) ---
+# 믹싱/확장은 수십 초~수 분 걸리는 CPU 작업이므로 이벤트 루프가 아닌 별도 프로세스에서 실행
+def _warmup_worker():
+    """
+    워커 프로세스 초기화: librosa 지연 import와 numba JIT(비트 트래킹 등)를 첫 요청 전에 끝냄
+    
+    짧은 120 BPM 클릭 트랙으로 분석 → 크로스페이드 → 정규화를 한 번 돌려서
+    /api/analyze, /api/extend, /api/mix가 워커에서 실제로 타는 경로를 모두 미리 컴파일
+    (우리 커널은 시그니처를 명시해 import 시점에 컴파일되고 cache=True로 재시작 후에도 재사용됨)
+    
+    워커가 CPU 코어 수만큼 있으므로 워커마다 Numba 병렬 커널 스레드는 1개로 제한 (코어² 과점유 방지)
+    """
+    numba.set_num_threads(1)
+    sr = 44100
+    clicks = np.zeros((sr * 8, 2), dtype=np.float32)
+    clicks[::sr // 2] = 0.5
+    with contextlib.redirect_stdout(io.StringIO()):
+        AudioAnalyzer.from_array(clicks, sr).analyze_full()
+        mixer = AdvancedMixer()
+        mixer.normalize_audio(mixer.create_crossfade(clicks, clicks, 4.0, 0.0, 2.0))
+
+def _do_mix(paths: List[str], output_path: str, transition_style: str) -> str:
+    mixer = AdvancedMixer()
+    return mixer.mix_playlist(
+        paths, output_path,
+        sync_beats=True,
+        match_tempo=True,
+        harmonic_mix=True,
+        transition_bars=16,
+        transition_style=transition_style,
+        auto_detect=True,
+        in_process=True  # 이미 풀 워커 안이므로 트랙 분석용 풀을 또 만들지 않음
+    )
+
+def _do_extend(path: str, output_path: str, duration: str,
+               analysis: Optional[Dict]) -> Tuple[str, Dict]:
+    # 캐시된 분석이 없으면 extender가 분석한 결과를 돌려보내 다음 요청에서 재사용
+    extender = MusicExtender()
+    output_path = extender.extend_track(path, output_path, duration, analysis=analysis)
+    return output_path, extender.last_analysis
+
+def _do_analyze(path: str) -> Dict:
+    return AudioAnalyzer(path).analyze_full()
+
+def _analysis_summary(result: Dict) -> Dict:
+    # NumPy 타입 등을 JSON 호환으로 변환
+    return {
+        "bpm": float(result['bpm']),
+        "key": result['full_key'],
+        "camelot": result['camelot'],
+        "duration": float(result['duration']),
+        "energy": float(result['avg_energy']),
+        # segments 등 복잡한 데이터는 생략 또는 단순화
+    }
+
+
 # --- API Endpoints ---
 
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...), api_key: str = Depends(get_api_key)):
-    """오디오 파일 업로드"""
+async def upload_file(request: Request, filename: str, api_key: str = Depends(get_api_key)):
+    """
+    오디오 파일 업로드
+    
+    요청 본문에 파일 바이트를 그대로 보내고 원본 파일명은 ?filename= 으로 전달
+    (multipart 파싱/스풀링 없이 받은 청크를 바로 디스크에 기록)
+    """
     file_id = str(uuid.uuid4())
-    file_ext = Path(file.filename).suffix
+    file_ext = Path(filename).suffix
     file_path = UPLOAD_DIR / f"{file_id}{file_ext}"
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            async for chunk in request.stream():
+                await buffer.write(chunk)
+    except BaseException:
+        # 업로드 도중 연결이 끊기면 (ClientDisconnect/취소) 등록되지 않은 부분 파일이 남지 않게 삭제
+        file_path.unlink(missing_ok=True)
+        raise
+    register_file(UPLOAD_INDEX, file_id, file_path)
         
-    return {"file_id": file_id, "filename": file.filename, "message": "File uploaded successfully"}
+    return {"file_id": file_id, "filename": filename, "message": "File uploaded successfully"}
 
 
 @app.get("/api/analyze/{file_id}")
 async def analyze_audio(file_id: str, api_key: str = Depends(get_api_key)):
     """오디오 분석 (BPM, Key 등)"""
     # 파일 찾기
-    found_files = list(UPLOAD_DIR.glob(f"{file_id}.*"))
-    if not found_files:
+    found = UPLOAD_INDEX.get(file_id)
+    if found is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    file_path = str(found_files[0])
+    file_path = str(found)
     
     try:
-        analyzer = AudioAnalyzer(file_path)
-        # 전체 분석 대신 빠른 분석 (tempo, key만)
-        # analyze_full은 시간이 걸리므로 비동기 처리가 좋지만, 여기선 간단히 직접 호출
-        result = analyzer.analyze_full()
-        
-        # NumPy 타입 등을 JSON 호환으로 변환
-        return JSONResponse(content={
-            "bpm": float(result['bpm']),
-            "key": result['full_key'],
-            "camelot": result['camelot'],
-            "duration": float(result['duration']),
-            "energy": float(result['avg_energy']),
-            # segments 등 복잡한 데이터는 생략 또는 단순화
-        })
+        # librosa 분석은 CPU 작업이므로 프로세스 풀에서 실행해 이벤트 루프를 막지 않음
+        result = ANALYSIS_CACHE.get(file_id)
+        if result is None:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(app.state.pool, _do_analyze, file_path)
+            _store_analysis(file_id, found, result)
+        return JSONResponse(content=_analysis_summary(result))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class MixRequest(BaseModel):
     track_ids: List[str]
@@ -118,7 +268,7 @@ class MixRequest(BaseModel):
 
 class ExtendRequest(BaseModel):
     file_id: str
-    duration: str = '30m'
+    duration: str = Field('30m', pattern=DURATION_PATTERN)
 
 @app.post("/api/mix")
 async def mix_tracks(
@@ -131,26 +281,27 @@ async def mix_tracks(
 
     paths = []
     for tid in request.track_ids:
-        found = list(UPLOAD_DIR.glob(f"{tid}.*"))
-        if not found:
+        found = UPLOAD_INDEX.get(tid)
+        if found is None:
             raise HTTPException(status_code=404, detail=f"Track ID {tid} not found")
-        paths.append(str(found[0]))
+        paths.append(str(found))
+    
+    cache_key = _result_key("mix", request.track_ids, style=request.transition_style)
+    cached_id = _cached_result(cache_key)
+    if cached_id is not None:
+        return {"output_id": cached_id, "download_url": f"/api/download/{cached_id}"}
     
     output_id = str(uuid.uuid4())
     output_filename = f"mixed_{output_id}.mp3"
     output_path = str(OUTPUT_DIR / output_filename)
     
     try:
-        mixer = AdvancedMixer()
-        mixer.mix_playlist(
-            paths, output_path,
-            sync_beats=True,
-            match_tempo=True,
-            harmonic_mix=True,
-            transition_bars=16,
-            transition_style=request.transition_style,
-            auto_detect=True
+        loop = asyncio.get_running_loop()
+        output_path = await loop.run_in_executor(
+            app.state.pool, _do_mix, paths, output_path, request.transition_style
         )
+        register_file(OUTPUT_INDEX, output_id, Path(output_path))
+        RESULT_CACHE[cache_key] = output_id
         return {"output_id": output_id, "download_url": f"/api/download/{output_id}"}
         
     except Exception as e:
@@ -165,23 +316,37 @@ async def extend_track(
     api_key: str = Depends(get_api_key)
 ):
     """트랙(오디오/비디오) 무한 반복 확장"""
-    files = list(UPLOAD_DIR.glob(f"{request.file_id}.*"))
-    if not files:
+    found = UPLOAD_INDEX.get(request.file_id)
+    if found is None:
         raise HTTPException(status_code=404, detail="File not found")
-    path = str(files[0])
+    path = str(found)
     
-    # 확장자 유지 (비디오/이미지인 경우 mp4로 고정, 오디오는 mp3)
+    # 이미지는 분석할 오디오가 없으므로 프로세스 풀 작업을 예약하기 전에 거부
+    if path.lower().endswith(IMAGE_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Image-only extension requires an accompanying audio file")
+    
+    # 확장자 유지 (비디오인 경우 mp4로 고정, 오디오는 mp3)
     is_video = path.lower().endswith(('.mp4', '.mov', '.avi', '.mkv', '.webm'))
-    is_image = path.lower().endswith(('.jpg', '.jpeg', '.png', '.webp', '.bmp'))
-    ext = ".mp4" if (is_video or is_image) else ".mp3"
+    ext = ".mp4" if is_video else ".mp3"
+    
+    cache_key = _result_key("extend", [request.file_id], duration=request.duration)
+    cached_id = _cached_result(cache_key)
+    if cached_id is not None:
+        return {"output_id": cached_id, "download_url": f"/api/download/{cached_id}"}
     
     output_id = str(uuid.uuid4())
     output_filename = f"extended_{output_id}{ext}"
     output_path = str(OUTPUT_DIR / output_filename)
     
     try:
-        extender = MusicExtender()
-        extender.extend_track(path, output_path, request.duration)
+        loop = asyncio.get_running_loop()
+        output_path, analysis = await loop.run_in_executor(
+            app.state.pool, _do_extend, path, output_path, request.duration,
+            ANALYSIS_CACHE.get(request.file_id)
+        )
+        _store_analysis(request.file_id, found, analysis)
+        register_file(OUTPUT_INDEX, output_id, Path(output_path))
+        RESULT_CACHE[cache_key] = output_id
         return {"output_id": output_id, "download_url": f"/api/download/{output_id}"}
         
     except Exception as e:
@@ -194,16 +359,15 @@ async def extend_track(
 async def download_result(output_id: str):
     """결과 파일 다운로드 (API Key 불필요 - 웹에서 직접 다운로드)"""
     # 보안상 API Key를 요구할 수도 있지만, 다운로드는 편리하게 허용
-    files = list(OUTPUT_DIR.glob(f"*{output_id}*"))
-    if not files:
+    path = OUTPUT_INDEX.get(output_id)
+    if path is None:
         raise HTTPException(status_code=404, detail="File expired or not found")
         
-    path = files[0]
     ext = path.suffix
     is_video = ext.lower() in ['.mp4', '.mov', '.avi']
     media_type = "video/mp4" if is_video else "audio/mpeg"
     
-    return FileResponse(
+    return _ResultFileResponse(
         path, 
         media_type=media_type, 
         filename=f"dj_station_result{ext}"
@@ -106,8 +106,7 @@ const FileUploader = ({ onFileSelect, label, icon, acceptMedia }) => {
     accept: acceptMedia
       ? {
         'audio/*': ['.mp3', '.wav', '.flac', '.m4a'],
-        'video/*': ['.mp4', '.mov', '.avi'],
-        'image/*': ['.jpg', '.jpeg', '.png', '.webp']
+        'video/*': ['.mp4', '.mov', '.avi']
       }
       : { 'audio/*': ['.mp3', '.wav', '.flac', '.m4a'] },
     onDrop: (acceptedFiles) => {
@@ -132,7 +131,7 @@ const FileUploader = ({ onFileSelect, label, icon, acceptMedia }) => {
         </div>
         <p className="text-sm font-bold tracking-tight">{label}</p>
         <p className="text-xs text-slate-500 mt-1 opacity-70">
-          {isDragActive ? 'Drop it here' : (acceptMedia ? 'Audio, Video or Image' : 'Audio Files')}
+          {isDragActive ? 'Drop it here' : (acceptMedia ? 'Audio or Video' : 'Audio Files')}
         </p>
       </div>
     </div>
@@ -261,11 +260,12 @@ function App() {
       setExtenderSource(newTrack);
     }
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
-      const uploadRes = await apiClient.post('/upload', formData);
+      // 파일 바이트를 요청 본문으로 그대로 전송 (서버에서 청크 단위로 스트리밍 저장)
+      const uploadRes = await apiClient.post('/upload', file, {
+        params: { filename: file.name },
+        headers: { 'Content-Type': file.type || 'application/octet-stream' }
+      });
       const fileId = uploadRes.data.file_id;
       const analyzeRes = await apiClient.get(`/analyze/${fileId}`);
 
@@ -408,7 +408,7 @@ function App() {
                   <div className="space-y-4">
                     {!extenderSource ? (
                       <FileUploader
-                        label="Source Media (Audio/Video/Image)"
+                        label="Source Media (Audio/Video)"
                         onFileSelect={handleFileUpload}
                         icon={<Wand2 className="w-6 h-6 text-purple-600" />}
                         acceptMedia={true}
@@ -437,8 +437,7 @@ function App() {
                       </div>
                       <p className="text-xs text-slate-400 text-center px-4 leading-relaxed">
                         The AI will loop your {isProcessing ? 'content' : (
-                          extenderSource?.file?.type.startsWith('image') ? 'image as a background' :
-                            extenderSource?.file?.type.startsWith('video') ? 'video & audio' : 'audio'
+                          extenderSource?.file?.type.startsWith('video') ? 'video & audio' : 'audio'
                         )} seamlessly in <b>Lofi-girl style</b> for {loopDuration}.
                       </p>
                     </div>
@@ -7,59 +7,126 @@ import numpy as np
 import librosa
 import soundfile as sf
 import os
-import moviepy.editor as mp
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+from moviepy.config import get_setting
 from audio_analyzer import AudioAnalyzer
 from advanced_mixer import AdvancedMixer
 
 
+# 목표 시간 문자열 형식: 숫자 + 단위(s/m/h, 생략하면 초) - backend 요청 검증에도 사용
+DURATION_PATTERN = r'^(\d+(?:\.\d+)?)([smhSMH]?)$'
+_DURATION_RE = re.compile(DURATION_PATTERN)
+_DURATION_UNITS = {'': 1.0, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+# 오디오 트랙이 없어 확장할 수 없는 입력 (backend에서도 작업 예약 전에 같은 목록으로 거부)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
 class MusicExtender:
     """음악 및 비디오 확장 클래스"""
     
     def __init__(self):
         self.mixer = AdvancedMixer()
+        self.last_analysis = None  # 마지막 extend_track에서 사용한 분석 결과 (호출자가 캐시에 재사용)
     
     def parse_duration(self, duration_str: str) -> float:
         """
         시간 문자열을 초 단위로 변환
         예: '30m' -> 1800.0, '1h' -> 3600.0, '300s' -> 300.0
         """
-        duration_str = duration_str.lower()
-        if duration_str.endswith('m'):
-            return float(duration_str[:-1]) * 60
-        elif duration_str.endswith('h'):
-            return float(duration_str[:-1]) * 3600
-        elif duration_str.endswith('s'):
-            return float(duration_str[:-1])
-        else:
-            return float(duration_str)
-            
+        match = _DURATION_RE.match(duration_str.strip())
+        if not match:
+            raise ValueError(f"Invalid duration: {duration_str!r} (e.g. '300s', '30m', '1h')")
+        return float(match.group(1)) * _DURATION_UNITS[match.group(2).lower()]
+            
+    def _write_looped_video(self, input_path: str, output_path: str,
+                            audio: np.ndarray, sr: int,
+                            mixin_point: float, mixout_point: float, body_loops: int):
+        """
+        [처음~믹스아웃] + [믹스인~믹스아웃] × body_loops + [믹스인~끝] 순서로 비디오를 이어 붙이고
+        확장된 오디오와 합쳐 output_path로 기록
+        
+        세 조각만 한 번씩 인코딩하고 반복은 ffmpeg concat demuxer의 스트림 복사로 처리
+        (전체 길이를 다시 인코딩하지 않음, 오디오는 파일 없이 stdin으로 전달)
+        """
+        ffmpeg = get_setting("FFMPEG_BINARY")
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_path)))
+        
+        try:
+            # 조각 인코딩 (재인코딩이라 키프레임과 상관없이 프레임 단위로 정확히 잘림)
+            # 5000k 비트레이트는 그대로 두고 x264 프리셋만 ultrafast로 낮춰 인코딩 CPU 시간 절감
+            parts = {
+                'part_a': (0.0, mixout_point),
+                'body': (mixin_point, mixout_point),
+                'part_c': (mixin_point, None),
+            }
+            part_paths = {}
+            for name, (start, end) in parts.items():
+                part_paths[name] = os.path.join(work_dir, f"{name}.mp4")
+                cmd = [ffmpeg, '-y', '-loglevel', 'error', '-ss', f"{start:.6f}", '-i', input_path]
+                if end is not None:
+                    cmd += ['-t', f"{end - start:.6f}"]
+                cmd += ['-an', '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', '5000k',
+                        '-pix_fmt', 'yuv420p', part_paths[name]]
+                subprocess.run(cmd, check=True)
+            
+            list_path = os.path.join(work_dir, 'concat.txt')
+            with open(list_path, 'w') as f:
+                sequence = ['part_a'] + ['body'] * body_loops + ['part_c']
+                f.writelines(f"file '{part_paths[name]}'\n" for name in sequence)
+            
+            # 비디오는 스트림 복사, 오디오는 float32 PCM을 stdin으로 받아 AAC 인코딩
+            print(f"📦 Writing final media: {output_path}")
+            cmd = [
+                ffmpeg, '-y', '-loglevel', 'error',
+                '-f', 'concat', '-safe', '0', '-i', list_path,
+                '-f', 'f32le', '-ar', str(sr), '-ac', str(audio.shape[1]), '-i', 'pipe:0',
+                '-map', '0:v', '-map', '1:a', '-c:v', 'copy', '-c:a', 'aac',
+                '-t', f"{audio.shape[0] / sr:.6f}", output_path
+            ]
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+            try:
+                proc.stdin.write(memoryview(np.ascontiguousarray(audio, dtype=np.float32)).cast('B'))
+            finally:
+                proc.stdin.close()
+            if proc.wait() != 0:
+                raise subprocess.CalledProcessError(proc.returncode, cmd)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
     def extend_track(self, input_path: str, output_path: str, 
                      target_duration_str: str, 
-                     transition_bars: int = 16) -> str:
+                     transition_bars: int = 16,
+                     analysis: Optional[Dict] = None) -> str:
         """
-        트랙(오디오, 비디오 또는 이미지)을 목표 시간까지 반복 확장
+        트랙(오디오 또는 비디오)을 목표 시간까지 반복 확장
+        
+        analysis: 같은 파일의 analyze_full() 결과가 이미 있으면 넘겨서 재분석 생략
         """
         lower_path = input_path.lower()
+        if lower_path.endswith(IMAGE_EXTENSIONS):
+            # 이미지에는 분석할 오디오가 없으므로 디코딩/분석을 시작하기 전에 거부
+            raise ValueError("Image-only extension requires an accompanying audio file")
         is_video = lower_path.endswith(('.mp4', '.mov', '.avi', '.mkv', '.webm'))
-        is_image = lower_path.endswith(('.jpg', '.jpeg', '.png', '.webp', '.bmp'))
-        is_media = is_video or is_image
         
-        video_temp_audio = "temp_video_audio.wav"
+        # 임시 파일은 출력 경로 기준으로 이름을 정해 동시에 여러 작업이 돌아도 겹치지 않게 함
+        output_base = os.path.splitext(output_path)[0]
+        video_temp_audio = f"{output_base}_source_audio.wav"
         
-        # 미디어인 경우 오디오 추출 (이미지는 오디오 없음)
+        # 비디오인 경우 오디오 추출
         actual_input = input_path
         if is_video:
             print("🎬 Video detected. Extracting audio for processing...")
-            video = mp.VideoFileClip(input_path)
-            video.audio.write_audiofile(video_temp_audio, logger=None)
+            subprocess.run([get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error', '-i', input_path,
+                            '-vn', '-c:a', 'pcm_s16le', '-ar', str(self.mixer.sample_rate), video_temp_audio],
+                           check=True)
             actual_input = video_temp_audio
-        elif is_image:
-            print("🖼️ Image detected. Processing as a static background...")
-            # 이미지는 오디오가 없으므로 사용자가 이전에 업로드한 오디오가 필요하지만,
-            # 현재 구조상 '이미지 + 오디오' 동시 업로드 기능이 아니므로 
-            # 여기서는 분석할 오디오가 필요함. 
-            # 만약 이미지만 넣었다면 에러가 날 것이므로 backend에서 방어해야함.
-            pass
 
         target_duration = self.parse_duration(target_duration_str)
         
@@ -67,14 +134,17 @@ class MusicExtender:
         print(f"🔄 Media Extender: Extending to {target_duration_str}")
         print(f"{'='*70}\n")
         
-        # 1. 분석 (이미지인 경우 오디오 분석 불가하므로 처리 필요)
-        print("📊 Analyzing track...")
-        analyzer = AudioAnalyzer(actual_input)
-        analysis = analyzer.analyze_full()
+        # 1. 분석 (호출자가 같은 파일의 분석 결과를 넘기면 재사용)
+        if analysis is None:
+            print("📊 Analyzing track...")
+            analysis = AudioAnalyzer(actual_input).analyze_full()
+        else:
+            print("📊 Using provided analysis")
+        self.last_analysis = analysis
         
         # 2. 오디오 로드
         print("\n📂 Loading audio...")
-        audio, sr = self.mixer.load_audio(input_path)
+        audio, sr = self.mixer.load_audio(actual_input)
         original_duration = analysis['duration']
         
         # 3. 반복 횟수 계산
@@ -107,237 +177,84 @@ class MusicExtender:
         
         if required_loops <= 1:
             print("⚠️  Target duration is shorter than original. Copying original.")
-            sf.write(output_path, audio.T, sr)
+            sf.write(output_path, audio, sr)
             return output_path
             
         # 4. 루프 생성
         print(f"\n🔨 Building extended track ({required_loops} iterations)...")
         
-        # 첫 번째 블록 (처음 ~ 믹스아웃)
-        # 실제로는 크로스페이드를 위해 끝까지 필요할 수 있음
-        # 메모리 효율을 위해 전체를 한 번에 빌드하지 않고, 점진적으로 추가
-        
-        current_audio = audio
-        
-        # 진행 상황 표시를 위해
-        import sys
-        
-        for i in range(required_loops - 1):
-            sys.stdout.write(f"\r  Progress: {i+1}/{required_loops-1} loops mixed")
-            sys.stdout.flush()
-            
-            # current_audio의 끝부분(Outro)과 audio의 앞부분(Intro)을 믹싱
-            
-            # 비트 정렬 및 크로스페이드
-            # align_beats 함수는 audio2를 이동시키거나 자르는데, 여기서는 audio2(원본)의 시작점을 맞춤
-            
-            # 믹스아웃 포인트는 current_audio 기준 (끝에서 loop_length 만큼 전이 아니라, 분석된 지점)
-            # 하지만 current_audio는 계속 길어지므로, 매번 길이를 재계산해서 상대 위치를 찾아야 함
-            # 첫 번째 루프: mixout_point
-            # 두 번째 루프: mixout_point + loop_length
-            # ...
-            
-            # 단순화를 위해:
-            # 1. Base Audio 생성 (반복 횟수만큼)
-            # 2. 각 접합부에서 Crossfade 적용
-            pass
-            
-        # 메모리 문제 방지를 위해 전략 수정:
-        # Crossfade부분만 계산하고, 나머지는 그대로 붙임
-        
-        # [Intro ... Body ... MixOutStart]  +  [MixInStart ... Body ... Outro]
-        #                    \ Crossfade /
-        
-        # Part A: Start to MixOut
-        part_a = audio[:, :int(mixout_point * sr)]
-        
-        # Part B: MixIn to End
-        part_b = audio[:, int(mixin_point * sr):]
-        
-        # Crossfade Region Calculation
-        # 두 오디오를 겹칠 길이
+        # 크로스페이드 길이 (transition_bars 마디)
         crossfade_duration = (60 / analysis['bpm']) * 4 * transition_bars
         crossfade_samples = int(crossfade_duration * sr)
         
-        # 실제 믹싱 로직
-        # 1. 첫 번째 파트 준비
-        final_audio_parts = [audio[:, :int(mixout_point * sr)]]
-        current_length = final_audio_parts[0].shape[1]
-        
-        # 2. 루프 추가
-        # 여기서 '정교한' 믹싱을 하려면 AdvancedMixer.create_crossfade를 써야 하는데
-        # 구조상 약간 복잡함. 직접 구현:
-        
-        # 루프의 핵심은: [End of Prev]와 [Start of Next]를 겹치는 것
-        # Prev: ... [FadeOut Region] ...
-        # Next: [FadeIn Region] ...
-        
-        # 간단한 접근:
-        # 1. Main Body: (Mixin Point + Crossfade/2) ~ (Mixout Point - Crossfade/2)
-        # 2. Transition Block: (Mixout - Crossfade/2) + (Mixin - Crossfade/2) -> Mixed
-        
-        # 더 간단한 접근 (DJ 스타일):
-        # Base Loop: audio[Mixin_Point : Mixout_Point] (중간 몸통)
-        # 하지만 이렇게 하면 Intro/Outro가 사라짐.
-        
-        # Intro(0~Mixin) + [Body(Mixin~Mixout) * N] + Outro(Mixout~End)
-        # 문제는 Body와 Body 사이, Intro-Body 사이의 연결이 매끄러워야 함.
-        
-        # 해결책:
-        # Recursive approach using mixer.create_crossfade is memory intensive for long files.
-        # But for MVP (30 mins), 300MB ~ 600MB RAM is okay.
+        # "Append with Crossfade" 방식:
+        # 매 반복마다 현재 믹스의 믹스아웃 지점(끝에서 time_from_end 초 전)부터
+        # 원본의 믹스인 지점 이후를 겹쳐 붙임
+        # Prev: [Start ............ Mixout] (Fade Out)
+        # Next:           [Mixin ............ End] (Fade In)
+        time_from_end = int((original_duration - mixout_point) * sr)
+        next_audio = audio[int(mixin_point * sr):]
+        
+        # 겹치는 길이 (원본의 믹스인 이후 구간이 크로스페이드보다 짧으면 그만큼만)
+        overlap = min(crossfade_samples, next_audio.shape[0])
+        
+        # 각 접합부의 겹침 시작 위치와 최종 길이를 먼저 계산해서 버퍼를 한 번만 할당
+        # (매 반복마다 concatenate로 전체 믹스를 다시 복사하지 않음)
+        # 크로스페이드가 현재 믹스의 끝을 넘어가면 끝에 맞춰 앞당겨 겹침
+        joins = []
+        length = max_length = audio.shape[0]
+        while len(joins) < required_loops - 1:
+            fade_end_idx = min(length - time_from_end + crossfade_samples, length)
+            overlap_start = max(fade_end_idx - overlap, 0)
+            joins.append(overlap_start)
+            length = overlap_start + next_audio.shape[0]
+            max_length = max(max_length, length)
+            
+            # Stop if duration reached
+            if length / sr >= target_duration:
+                break
         
-        full_mix = audio
+        full_mix = np.empty((max_length, audio.shape[1]), dtype=np.float32)
+        full_mix[:audio.shape[0]] = audio
         
-        for i in range(required_loops - 1):
-            sys.stdout.write(f"\r  Progress: {i+1}/{required_loops-1}")
-            sys.stdout.flush()
-            
-            # 현재 믹스의 끝부분과 원본의 앞부분을 믹싱
-            # current_mixout = current_length - (original_duration - mixout_point)
-            # 너무 복잡함.
-            
-            # "Append with Crossfade" 방식
-            # Prev Track의 Mixout Point 지점부터 Next Track의 Mixin Point 지점을 겹침
-            
-            # 1. Prev Track의 믹스아웃 지점 계산 (마지막 섹션)
-            # Prev Track의 길이는 계속 변함.
-            # 하지만 믹싱 포인트는 항상 '끝에서 (Duration - MixoutPoint) 초 전'임.
-            
-            time_from_end = original_duration - mixout_point
-            current_mixout_index = full_mix.shape[1] - int(time_from_end * sr)
-            
-            # 2. Next Track (Original)의 믹스인 지점
-            next_mixin_index = int(mixin_point * sr)
-            
-            # 3. 겹치는 구간 (Crossfade length)
-            # mixout_point부터 crossfade_duration 만큼
-            
-            # 비트 정렬 (이미 같은 곡이라 BPM 같음, 위상만 맞추면 됨)
-            # align_beats 로직 재사용
-            
-            # 잘라내기 및 붙이기
-            # Prev: [Start ............ Mixout] (Fade Out)
-            # Next:           [Mixin ............ End] (Fade In)
-            
-            # A: Prev before fade
-            # B: Mixed part
-            # C: Next after fade
-            
-            fade_start_idx = current_mixout_index
-            fade_end_idx = fade_start_idx + crossfade_samples
-            
-            # Next track starts at: fade_start_idx corresponds to mixin_point in Next Track
-            # But we need to align beats.
-            
-            # Beat alignment logic simplified for same track:
-            # Just ensure we cut exactly at beats?
-            # Let's trust mixout/mixin points provided by find_optimal_transition_point which aligns to beats.
-            
-            # Prev Track을 fade_start_idx + crossfade_samples 까지만 유지 (나머지 버림)
-            prev_keep = full_mix[:, :fade_end_idx]
-            if prev_keep.shape[1] < fade_end_idx:
-                # Pad if needed (shouldn't happen if mixout point is valid)
-                pass
-                
-            # Next Track (Original) 준비
-            # mixin_point부터 시작하되, crossfade_samples 만큼은 겹침
-            next_start_idx = int(mixin_point * sr)
-            next_audio = audio[:, next_start_idx:]
-            
-            # Crossfade 적용
-            # 겹치는 부분: prev_keep[-crossfade_samples:] 과 next_audio[:crossfade_samples]
-            
-            # Create curves
-            fade_out = np.linspace(1, 0, crossfade_samples)
-            fade_in = np.linspace(0, 1, crossfade_samples)
+        # 진행 상황은 0.5초에 한 번만 출력 (반복마다 flush하면 긴 확장에서 TTY 쓰기가 병목)
+        last_log = 0.0
+        for i, overlap_start in enumerate(joins):
+            now = time.monotonic()
+            if now - last_log > 0.5 or i == len(joins) - 1:
+                sys.stdout.write(f"\r  Progress: {i+1}/{len(joins)}")
+                sys.stdout.flush()
+                last_log = now
             
-            # Overlap Area
-            overlap_prev = prev_keep[:, -crossfade_samples:]
-            overlap_next = next_audio[:, :crossfade_samples]
+            # 비트 정렬은 find_optimal_transition_point가 맞춘 지점을 그대로 사용 (같은 곡이라 BPM 동일)
+            # Mix overlap: [Prev Body] + [Overlap Mixed] + [Next Body]
+            # 겹침 구간은 한 번의 패스로 제자리에서 선형 페이드 아웃 + 페이드 인
+            self.mixer.linear_crossfade_inplace(full_mix, next_audio, overlap_start, overlap)
             
-            # Mix overlap
-            overlap_mixed = (overlap_prev * fade_out) + (overlap_next * fade_in)
-            
-            # Concat: [Prev Body] + [Overlap Mixed] + [Next Body]
-            prev_body = prev_keep[:, :-crossfade_samples]
-            next_body = next_audio[:, crossfade_samples:]
-            
-            # Combine
-            full_mix = np.concatenate([prev_body, overlap_mixed, next_body], axis=1)
-            
-            # Stop if duration reached
-            if full_mix.shape[1] / sr >= target_duration:
-                break
-                
-        print(f"\n✅ Extended logic complete. Final duration: {full_mix.shape[1]/sr:.1f}s")
+            full_mix[overlap_start + overlap:overlap_start + next_audio.shape[0]] = next_audio[overlap:]
+        
+        full_mix = full_mix[:length]
+        
+        print(f"\n✅ Extended logic complete. Final duration: {full_mix.shape[0]/sr:.1f}s")
         
         # Normalize
         full_mix = self.mixer.normalize_audio(full_mix)
         
-        # Save Audio
-        audio_output = output_path if not is_media else "temp_extended_audio.wav"
-        sf.write(audio_output, full_mix.T, sr)
-        print(f"💾 Saved audio to {audio_output}")
+        # Save Audio (비디오는 파일을 거치지 않고 메모리의 배열을 바로 오디오 트랙으로 사용)
+        if not is_video:
+            sf.write(output_path, full_mix, sr)
+            print(f"💾 Saved audio to {output_path}")
+        
+        # 6. 비디오 처리
+        if is_video:
+            print("\n🎬 Looping video to match audio duration (Lofi-style/Seamless)...")
+            self._write_looped_video(input_path, output_path, full_mix, sr,
+                                     mixin_point, mixout_point, required_loops - 1)
+            if os.path.exists(video_temp_audio): os.unlink(video_temp_audio)
         
-        # 6. 미디어 처리 (비디오 또는 이미지)
-        if is_media:
-            audio_clip = mp.AudioFileClip(audio_output)
-            
-            if is_video:
-                print("\n🎬 Looping video to match audio duration (Lofi-style/Seamless)...")
-                video_clip = mp.VideoFileClip(input_path)
-                
-                # 오디오 루프 포인트에 맞춰 비디오 조각(Clip) 생성
-                clips = []
-                part_a = video_clip.subclip(0, mixout_point)
-                clips.append(part_a)
-                
-                body_segment = video_clip.subclip(mixin_point, mixout_point)
-                for _ in range(required_loops - 1):
-                    clips.append(body_segment)
-                    
-                part_c = video_clip.subclip(mixin_point, video_clip.duration)
-                clips.append(part_c)
-                
-                final_video = mp.concatenate_videoclips(clips, method="compose")
-                final_video = final_video.set_duration(audio_clip.duration)
-                for c in clips: c.close()
-                video_clip.close()
-            
-            elif is_image:
-                print("\n🖼️ Creating animated 5s loop from image (Ken Burns style)...")
-                # 5초짜리 움직이는 영상을 만듬 (미세한 줌 효과)
-                base_duration = 5.0
-                image_clip = mp.ImageClip(input_path).set_duration(base_duration)
-                
-                # Ken Burns Effect: 1.0에서 1.1배로 천천히 확대
-                def zoom(t):
-                    return 1.0 + 0.1 * (t / base_duration)
-                
-                animated_clip = image_clip.params_setter(lambda clip: clip.resize(zoom))
-                
-                # 5초 영상을 전체 길이에 맞춰 반복
-                num_loops = int(np.ceil(audio_clip.duration / base_duration))
-                final_video = mp.concatenate_videoclips([animated_clip] * num_loops, method="compose")
-                final_video = final_video.set_duration(audio_clip.duration)
-                image_clip.close()
-                animated_clip.close()
-            
-            final_video = final_video.set_audio(audio_clip)
-            
-            print(f"📦 Writing final media: {output_path}")
-            final_video.write_videofile(output_path, codec="libx264", audio_codec="aac", bitrate="5000k", logger=None)
-            
-            # Cleanup
-            audio_clip.close()
-            if os.path.exists(video_temp_audio): os.path.unlink(video_temp_audio)
-            if os.path.exists("temp_extended_audio.wav"): os.path.unlink("temp_extended_audio.wav")
-            
         return output_path
 
 if __name__ == "__main__":
-    import sys
     if len(sys.argv) < 3:
         print("Usage: python music_extender.py <input> <output> <duration>")
         sys.exit(1)